@@ -1,29 +1,144 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+import gzip
 import logging
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException,  Query, Path
-from typing import Optional, List, Dict
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException,  Query, Path, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from typing import Optional, List, Dict, Tuple
 
 from api.auth import verify_api_key
-from api.models import Book, CategoryStats, HealthResponse, OverviewStats
+from api.models import Book, BookRow, CategoryStats, HealthResponse, OverviewStats
 from scripts.load_and_refresh_books import load_books, scrape_job
 
 
 DATA_PATH = "./data/all_books.csv"
 SCRAPE_STATE = {"running": False, "last_success_path": None, "last_error": None}
-BOOKS: List[Book] = []
+GZIP_MIN_SIZE = 1024
 
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True, eq=False)
+class Snapshot:
+    # Immutable view of the dataset and everything derived from it. Handlers read
+    # SNAPSHOT once and use that local, so a reload mid-request is never observed.
+    books: List[BookRow]
+    by_id: Dict[int, BookRow]
+    titles_lc: List[str]
+    category_index: Dict[str, List[int]]
+    categories_sorted: List[str]
+    top_rated: List[BookRow]
+    price_sorted_idx: List[int]
+    prices_sorted: List[float]
+    prices: np.ndarray
+    cat_codes: np.ndarray
+    cat_labels: List[str]
+    serialized: Dict[str, bytes]
+    serialized_gz: Dict[str, bytes]
+
+
+def build_snapshot(books: List[BookRow]) -> Snapshot:
+    # reversed() keeps the first occurrence on duplicate ids, as the old linear scan did
+    by_id = {b.id: b for b in reversed(books)}
+    titles_lc = [b.title.lower() for b in books]
+
+    index: Dict[str, List[int]] = defaultdict(list)
+    for i, b in enumerate(books):
+        index[b.category.lower()].append(i)
+    categories_sorted = sorted({b.category for b in books})
+
+    # Column arrays for the stats endpoints
+    total = len(books)
+    prices = np.fromiter((b.price for b in books), dtype=np.float64, count=total)
+    ratings = np.fromiter((b.rating for b in books), dtype=np.int64, count=total)
+    cat_codes, cat_labels = pd.factorize(np.array([b.category for b in books], dtype=object))
+
+    # The dataset only changes on reload, so the insight endpoints are computed once here
+    # np.unique rather than np.bincount, so negative or large ratings stay valid
+    rating_values, rating_counts = np.unique(ratings, return_counts=True)
+    rating_dist: Dict[int, int] = dict(zip(rating_values.tolist(), rating_counts.tolist()))
+    stats = {
+        "total_books": total,
+        "average_price": float(prices.mean()) if total else 0.0,
+        "rating_distribution": rating_dist,
+    }
+    max_rating = max(rating_dist) if rating_dist else None
+    top_rated = [b for b in books if b.rating == max_rating]
+
+    # Price-ordered view so price_range can bisect instead of scanning
+    price_sorted_idx = sorted(range(total), key=lambda i: books[i].price)
+    prices_sorted = [books[i].price for i in price_sorted_idx]
+
+    # Static payloads are serialized once per reload instead of once per request
+    serialized = {
+        "books": orjson.dumps(books),
+        "categories": orjson.dumps(categories_sorted),
+        "top_rated": orjson.dumps(top_rated),
+        "stats_overview": orjson.dumps(stats, option=orjson.OPT_NON_STR_KEYS),
+    }
+    serialized_gz = {
+        key: gzip.compress(body)
+        for key, body in serialized.items()
+        if len(body) >= GZIP_MIN_SIZE
+    }
+
+    return Snapshot(
+        books=books,
+        by_id=by_id,
+        titles_lc=titles_lc,
+        category_index=dict(index),
+        categories_sorted=categories_sorted,
+        top_rated=top_rated,
+        price_sorted_idx=price_sorted_idx,
+        prices_sorted=prices_sorted,
+        prices=prices,
+        cat_codes=cat_codes,
+        cat_labels=list(cat_labels),
+        serialized=serialized,
+        serialized_gz=serialized_gz,
+    )
+
+
+SNAPSHOT = build_snapshot([])
+
+
+def set_books(books: List[BookRow]):
+    # Build everything first (scrape_job calls this from a worker thread), then
+    # publish it with a single assignment
+    global SNAPSHOT
+    SNAPSHOT = build_snapshot(books)
+    _search.cache_clear()
+
+
+def cached_json(snap: Snapshot, key: str, request: Request) -> Response:
+    # Serve the pre-compressed body when possible; GZipMiddleware skips responses
+    # that already carry a Content-Encoding. The check mirrors the middleware's own
+    # (a plain substring test), since it would compress the plain body anyway.
+    body_gz = snap.serialized_gz.get(key)
+    if body_gz is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(
+            content=body_gz,
+            media_type="application/json",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return Response(content=snap.serialized[key], media_type="application/json")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # ---- Startup ----
     logger.info("Starting application...")
-    global BOOKS
-    BOOKS = load_books(DATA_PATH)
-    logger.info(f"Loaded {len(BOOKS)} books at startup")
+    set_books(load_books(DATA_PATH))
+    logger.info(f"Loaded {len(SNAPSHOT.books)} books at startup")
 
     yield
 
@@ -34,15 +149,10 @@ app = FastAPI(
     title="Books API",
     version="0.0.1",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
-
-# Logging middleware
-@app.middleware(middleware_type="http")
-async def log_requests(request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
-    return response
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+# Per-request logging is left to uvicorn's access log (--access-log / --no-access-log)
 
 
 
@@ -58,14 +168,26 @@ async def log_requests(request, call_next):
     description="Returns the full list of books loaded in memory.",
     dependencies=[Depends(verify_api_key)],
 )
-def list_books():
-    global BOOKS
-    return BOOKS
+async def list_books(request: Request):
+    return cached_json(SNAPSHOT, "books", request)
+
+
+@lru_cache(maxsize=256)
+def _search(snap: Snapshot, title_lc: Optional[str], category_lc: Optional[str]) -> Tuple[int, ...]:
+    # Returns row indices into snap.books; keyed on the snapshot so a reload never
+    # serves stale rows, and cleared by set_books to release old snapshots
+    # The category index already narrows candidates to exact (case-insensitive) matches
+    candidates = snap.category_index.get(category_lc, []) if category_lc else range(len(snap.books))
+    return tuple(
+        i for i in candidates
+        if title_lc is None or title_lc in snap.titles_lc[i]
+    )
 
 
 @app.get(
     "/api/v1/books/search/",
-    response_model=List[Book],
+    response_model=None,
+    responses={200: {"model": List[Book]}},
     tags=["Books"],
     summary="Search books by title and/or category",
     description=(
@@ -74,7 +196,7 @@ def list_books():
     ),
     dependencies=[Depends(verify_api_key)],
 )
-def search_books(
+async def search_books(
     title: Optional[str] = Query(
         default=None,
         description="Case-insensitive substring match on the book title.",
@@ -88,33 +210,34 @@ def search_books(
         min_length=1,
     ),
 ):
-    global BOOKS
-    return [
-        b for b in BOOKS
-        if (title is None or title.lower() in b.title.lower())
-        and (category is None or category.lower() == b.category.lower())
-    ]
+    snap = SNAPSHOT
+    matches = _search(
+        snap,
+        title.lower() if title else None,
+        category.lower() if category else None,
+    )
+    return ORJSONResponse([snap.books[i] for i in matches])
 
 
 @app.get(
     "/api/v1/books/{id}/",
-    response_model=Book,
+    response_model=None,
     tags=["Books"],
     summary="Get a book by id",
     responses={
+        200: {"model": Book},
         404: {"description": "Book not found"},
         401: {"description": "Unauthorized"},
     },
     dependencies=[Depends(verify_api_key)],
 )
-def get_book(
+async def get_book(
     id: int = Path(..., description="Book identifier.", examples=[1], ge=1),
 ):
-    global BOOKS
-    for book in BOOKS:
-        if book.id == id:
-            return book
-    raise HTTPException(status_code=404, detail="Book not found")
+    book = SNAPSHOT.by_id.get(id)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return ORJSONResponse(book)
 
 
 @app.get(
@@ -125,9 +248,8 @@ def get_book(
     description="Returns distinct categories found across all books.",
     dependencies=[Depends(verify_api_key)],
 )
-def list_categories():
-    global BOOKS
-    return sorted({book.category for book in BOOKS})
+async def list_categories(request: Request):
+    return cached_json(SNAPSHOT, "categories", request)
 
 
 @app.get(
@@ -136,9 +258,8 @@ def list_categories():
     tags=["Health"],
     summary="Health check",
 )
-def health_check():
-    global BOOKS
-    return {"status": "ok", "books_loaded": len(BOOKS)}
+async def health_check():
+    return {"status": "ok", "books_loaded": len(SNAPSHOT.books)}
 
 
 # ------------------------------
@@ -152,18 +273,8 @@ def health_check():
     summary="Overview stats",
     description="Returns high-level stats: total books, average price, and rating distribution.",
 )
-def stats_overview():
-    global BOOKS
-    total = len(BOOKS)
-    avg_price = sum(b.price for b in BOOKS) / total if total else 0.0
-    rating_dist: Dict[int, int] = {}
-    for b in BOOKS:
-        rating_dist[b.rating] = rating_dist.get(b.rating, 0) + 1
-    return {
-        "total_books": total,
-        "average_price": avg_price,
-        "rating_distribution": rating_dist,
-    }
+async def stats_overview(request: Request):
+    return cached_json(SNAPSHOT, "stats_overview", request)
 
 
 @app.get(
@@ -172,22 +283,17 @@ def stats_overview():
     tags=["Stats"],
     summary="Stats grouped by category",
 )
-def stats_by_category():
-    global BOOKS
-    stats: Dict[str, Dict[str, float]] = {}
-    for b in BOOKS:
-        if b.category not in stats:
-            stats[b.category] = {"count": 0, "total_price": 0.0}
-        stats[b.category]["count"] += 1
-        stats[b.category]["total_price"] += b.price
-
-    # Fix your original bug: you used stats.items() incorrectly.
+async def stats_by_category():
+    snap = SNAPSHOT
+    counts = np.bincount(snap.cat_codes, minlength=len(snap.cat_labels)).tolist()
+    sums = np.bincount(snap.cat_codes, weights=snap.prices, minlength=len(snap.cat_labels)).tolist()
+
     out: Dict[str, CategoryStats] = {}
-    for cat, v in stats.items():
+    for cat, count, total_price in zip(snap.cat_labels, counts, sums):
         out[cat] = CategoryStats(
-            count=int(v["count"]),
-            total_price=float(v["total_price"]),
-            average_price=float(v["total_price"]) / int(v["count"]) if v["count"] else 0.0,
+            count=count,
+            total_price=total_price,
+            average_price=total_price / count if count else 0.0,
         )
     return out
 
@@ -199,29 +305,28 @@ def stats_by_category():
     summary="List top-rated books",
     description="Returns all books with the maximum rating found in the dataset.",
 )
-def top_rated():
-    global BOOKS
-    if not BOOKS:
-        return []
-    max_rating = max(b.rating for b in BOOKS)
-    return [b for b in BOOKS if b.rating == max_rating]
+async def top_rated(request: Request):
+    return cached_json(SNAPSHOT, "top_rated", request)
 
 
 @app.get(
     "/api/v1/books/price-range",
-    response_model=List[Book],
+    response_model=None,
+    responses={200: {"model": List[Book]}},
     tags=["Books"],
     summary="Filter books by price range",
     description="Returns books where price is between min_value and max_value (inclusive).",
 )
-def price_range(
+async def price_range(
     min_value: float = Query(..., description="Minimum price (inclusive).", examples=[10.0], ge=0),
     max_value: float = Query(..., description="Maximum price (inclusive).", examples=[50.0], ge=0),
 ):
-    global BOOKS
     if min_value > max_value:
         raise HTTPException(status_code=422, detail="min_value must be <= max_value")
-    return [b for b in BOOKS if min_value <= b.price <= max_value]
+    snap = SNAPSHOT
+    lo = bisect_left(snap.prices_sorted, min_value)
+    hi = bisect_right(snap.prices_sorted, max_value)
+    return ORJSONResponse([snap.books[snap.price_sorted_idx[i]] for i in range(lo, hi)])
 
 
 
@@ -238,7 +343,7 @@ def price_range(
     dependencies=[Depends(verify_api_key)],
     status_code=202,
 )
-def scrape_and_reload(background_tasks: BackgroundTasks):
+async def scrape_and_reload(background_tasks: BackgroundTasks):
     if SCRAPE_STATE["running"]:
         raise HTTPException(status_code=409, detail="Scrape already running")
 
@@ -251,5 +356,5 @@ def scrape_and_reload(background_tasks: BackgroundTasks):
     summary="Get scraper job status",
     dependencies=[Depends(verify_api_key)],
 )
-def scrape_status():
+async def scrape_status():
     return SCRAPE_STATE
\ No newline at end of file
@@ -1,12 +1,16 @@
+import hmac
+import os
 from fastapi.security.api_key import APIKeyHeader
 from fastapi import Depends
 from fastapi import HTTPException
 
 # API Key Auth
-API_KEY = "mysecretkey"
+API_KEY = os.environ.get("API_KEY", "mysecretkey")
+_API_KEY_BYTES = API_KEY.encode()
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=True)
 
-def verify_api_key(api_key: str = Depends(api_key_header)):
-    if api_key != API_KEY:
+async def verify_api_key(api_key: str = Depends(api_key_header)):
+    # Constant-time comparison; bytes also accept non-ASCII header values
+    if not hmac.compare_digest(api_key.encode(), _API_KEY_BYTES):
         raise HTTPException(status_code=401, detail="Invalid API Key")
     return True
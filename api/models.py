@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Dict
 from pydantic import BaseModel, Field
 
@@ -12,6 +13,18 @@ class Book(BaseModel):
     image_url: str
 
 
+# In-memory row for the loaded dataset; endpoints still declare Book as response_model
+@dataclass(slots=True, frozen=True)
+class BookRow:
+    id: int
+    title: str
+    price: float
+    rating: int
+    availability: str
+    category: str
+    image_url: str
+
+
 class HealthResponse(BaseModel):
     status: str = Field(..., examples=["ok"])
     books_loaded: int = Field(..., examples=[1000])
@@ -2,14 +2,25 @@ import csv
 import logging
 from pathlib import Path
 from typing import List
-from api.models import Book
+import pandas as pd
+from api.models import Book, BookRow
 from scripts.scrapper import scrape_and_save_csv
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+BOOK_DTYPES = {
+    "id": "int64",
+    "title": "string",
+    "price": "float64",
+    "rating": "int64",
+    "availability": "string",
+    "category": "string",
+    "image_url": "string",
+}
 
-def load_books(csv_path: str) -> List[Book]:
+
+def load_books(csv_path: str) -> List[BookRow]:
     path = Path(csv_path)
 
     if not path.exists():
@@ -20,17 +31,37 @@ def load_books(csv_path: str) -> List[Book]:
         logger.warning(f"Books file is empty: {csv_path}")
         return []
 
-    books: List[Book] = []
+    try:
+        # na_filter=False keeps literal values such as the scraper's "N/A" category
+        df = pd.read_csv(
+            path,
+            usecols=list(BOOK_DTYPES),
+            dtype=BOOK_DTYPES,
+            na_filter=False,
+            encoding="utf-8",
+        )
+    except ValueError as e:
+        logger.warning(f"Fast load failed for {csv_path}, validating row by row | Error: {e}")
+        return _load_books_validated(path)
+
+    # Columns are already typed by read_csv, so skip per-row Pydantic validation
+    books = [BookRow(**row) for row in df.to_dict("records")]
+
+    logger.info(f"Books loaded from {csv_path}. Total: {len(books)}")
+    return books
+
+def _load_books_validated(path: Path) -> List[BookRow]:
+    books: List[BookRow] = []
 
     with path.open(newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             try:
-                books.append(Book(**row))
+                books.append(BookRow(**Book(**row).model_dump()))
             except Exception as e:
                 logger.error(f"Invalid row skipped: {row} | Error: {e}")
 
-    logger.info(f"Books loaded from {csv_path}. Total: {len(books)}")
+    logger.info(f"Books loaded from {path}. Total: {len(books)}")
     return books
 
 def scrape_job(SCRAPE_STATE: dict, DATA_PATH: str):
@@ -41,7 +72,7 @@ def scrape_job(SCRAPE_STATE: dict, DATA_PATH: str):
         output_path = scrape_and_save_csv(DATA_PATH)
         books = load_books(output_path)
         import api.api as api_module
-        api_module.BOOKS = books
+        api_module.set_books(books)
 
         SCRAPE_STATE["last_success_path"] = output_path
     except Exception as e:
@@ -1,139 +1,402 @@
 # scripts/scrapper.py
 import asyncio
+import csv
+from html import unescape
 import logging
 import os
+import random
 import re
-import requests
+from typing import Any, Callable, TypeVar
 import aiohttp
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml.etree import XPath
 import pandas as pd
 
+try:
+    import uvloop
+except ImportError:  # optional; falls back to the default asyncio loop
+    uvloop = None
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 BASE_URL = "https://books.toscrape.com/"
+CATALOGUE_URL = BASE_URL + "catalogue/"
+MAX_CONCURRENCY = 64
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Only advertise encodings aiohttp can always decode ("br" needs the optional brotli package)
+REQUEST_HEADERS = {"Accept-Encoding": "gzip, deflate", "User-Agent": "books-scraper/1.0"}
+
+# url -> (conditional request headers, parsed page) from the last successful fetch in
+# this process, so repeated reloads answered with 304 Not Modified skip the parse too.
+# Only the parse result is kept (not the HTML) and callers must not mutate it.
+_VALIDATOR_CACHE: dict[str, tuple[dict[str, str], Any]] = {}
+
+def make_connector() -> aiohttp.TCPConnector:
+    # One keep-alive pool per run; every request goes to the same host
+    return aiohttp.TCPConnector(
+        limit=128,
+        limit_per_host=MAX_CONCURRENCY,
+        ttl_dns_cache=300,
+        keepalive_timeout=30,
+    )
 
 def extract_book_id(url: str) -> int | None:
-    match = re.search(r"_(\d+)/index\.html$", url)
-    return int(match.group(1)) if match else None
-
-async def scrape_category_from_book_page_async(session, book_url: str) -> str:
-    try:
-        async with session.get(book_url) as response:
-            response.raise_for_status()
-            html = await response.text()
-    except aiohttp.ClientError as e:
-        logger.error(f"Error fetching book detail URL {book_url}: {e}")
+    # Equivalent to matching r"_(\d+)/index\.html$", using plain string ops
+    if not url.endswith("/index.html"):
+        return None
+    _, sep, digits = url[:-len("/index.html")].rpartition("_")
+    return int(digits) if sep and digits.isdecimal() else None
+
+async def fetch_parsed(session, sem, url: str, parse: Callable[[str], T]) -> T | None:
+    """
+    Fetches url and returns parse(html), or None if the request fails. A 304
+    reply returns the result cached for url by the previous successful fetch.
+    """
+    for attempt in range(MAX_RETRIES):
+        try:
+            cached = _VALIDATOR_CACHE.get(url)
+            async with sem, session.get(url, headers=cached[0] if cached else None) as response:
+                if response.status == 304 and cached:
+                    return cached[1]
+                response.raise_for_status()
+                # books.toscrape.com serves UTF-8; decoding directly skips charset sniffing
+                html = (await response.read()).decode("utf-8", errors="replace")
+
+            result = parse(html)
+            validators = {}
+            if "ETag" in response.headers:
+                validators["If-None-Match"] = response.headers["ETag"]
+            if "Last-Modified" in response.headers:
+                validators["If-Modified-Since"] = response.headers["Last-Modified"]
+            if validators:
+                _VALIDATOR_CACHE[url] = (validators, result)
+            return result
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRY_STATUSES or attempt == MAX_RETRIES - 1:
+                logger.error(f"Error fetching URL {url}: {e}")
+                return None
+        except aiohttp.ClientError as e:
+            logger.error(f"Error fetching URL {url}: {e}")
+            return None
+
+        # Rate limited or server hiccup: back off (outside the semaphore) and retry
+        await asyncio.sleep(2 ** attempt * 0.1 + random.random())
+    return None
+
+# Compiled once; evaluated by libxml2 without wrapping nodes in Python objects
+XP_BREADCRUMB_CATEGORY = XPath("//ul[@class='breadcrumb']/li[3]/a/text()")
+XP_ARTICLES = XPath("//article[@class='product_pod']")
+XP_TITLE = XPath("string(.//h3/a/@title)")
+XP_HREF = XPath("string(.//h3/a/@href)")
+XP_PRICE = XPath("normalize-space(.//p[@class='price_color'])")
+XP_RATING = XPath("string(.//p[contains(@class, 'star-rating')]/@class)")
+XP_AVAILABILITY = XPath("normalize-space(.//p[@class='instock availability'])")
+XP_IMAGE = XPath("string(.//img/@src)")
+XP_ARTICLE_HREFS = XPath("//article[@class='product_pod']//h3/a/@href")
+XP_PAGER_CURRENT = XPath("normalize-space(//ul[@class='pager']/li[@class='current'])")
+XP_SIDEBAR_CATEGORIES = XPath("//div[@class='side_categories']/ul/li/ul/li/a")
+
+def get_page_count(tree) -> int:
+    text = XP_PAGER_CURRENT(tree)
+    if not text:
+        return 1
+    return int(text.split("of")[-1])
+
+# Third breadcrumb entry (Home > Books > <category>) on a book detail page. Every
+# entry must be a bare link, so the match cannot run past the breadcrumb when the
+# category entry is missing (the active title is plain text, not a link)
+BREADCRUMB_CATEGORY_RE = re.compile(
+    r'<ul class="breadcrumb">'
+    r'\s*<li>\s*<a [^>]*>[^<]*</a>\s*</li>'
+    r'\s*<li>\s*<a [^>]*>[^<]*</a>\s*</li>'
+    r'\s*<li>\s*<a [^>]*>([^<]*)</a>'
+)
+
+# book_url -> category, kept for the life of the process (e.g. repeated reloads
+# from the API); failed fetches are not cached so they are retried next time
+_CAT_CACHE: dict[str, str] = {}
+
+def parse_breadcrumb_category(html: str) -> str:
+    # Only the breadcrumb is needed, so try to read it without building a tree
+    match = BREADCRUMB_CATEGORY_RE.search(html)
+    if match:
+        return unescape(match.group(1)).strip()
+    nodes = XP_BREADCRUMB_CATEGORY(lxml.html.fromstring(html))
+    return nodes[0].strip() if nodes else "N/A"
+
+async def scrape_category_from_book_page_async(session, sem, book_url: str) -> str:
+    if book_url in _CAT_CACHE:
+        return _CAT_CACHE[book_url]
+
+    category = await fetch_parsed(session, sem, book_url, parse_breadcrumb_category)
+    if category is None:
         return "N/A"
 
-    soup = BeautifulSoup(html, "html.parser")
-    breadcrumb = soup.find("ul", class_="breadcrumb")
-    if breadcrumb:
-        items = breadcrumb.find_all("li")
-        if len(items) >= 3:
-            category_element = items[2].find("a")
-            if category_element:
-                return category_element.get_text(strip=True)
-
-    return "N/A"
-
-async def scrape_book_page_async(session, url: str) -> list[dict]:
-    try:
-        async with session.get(url) as response:
-            response.raise_for_status()
-            html = await response.text()
-    except aiohttp.ClientError as e:
-        logger.error(f"Error fetching URL {url}: {e}")
-        return []
+    _CAT_CACHE[book_url] = category
+    return category
 
-    soup = BeautifulSoup(html, "html.parser")
-    articles = soup.find_all("article", class_="product_pod")
-    if not articles:
-        return []
+# books.toscrape.com renders every listing from the same template, so the
+# product_pod fields can be pulled with regexes instead of building a DOM
+PRODUCT_POD_RE = re.compile(r'<article class="product_pod">(.*?)</article>', re.S)
+TITLE_LINK_RE = re.compile(r'<h3><a href="([^"]+)" title="([^"]*)"')
+PRICE_RE = re.compile(r'<p class="price_color">([^<]+)</p>')
+RATING_RE = re.compile(r'<p class="star-rating (\w+)">')
+AVAILABILITY_RE = re.compile(r'<p class="instock availability">(.*?)</p>', re.S)
+IMAGE_RE = re.compile(r'<img src="([^"]+)"')
+TAG_RE = re.compile(r"<[^>]+>")
 
-    rating_map = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
-    books_data = []
+# Scraped listings are accumulated column-wise (one list per field) rather than
+# as one dict per book, and handed to pd.DataFrame as-is
+BookColumns = dict[str, list]
+# Keyed on the star-rating class exactly as the site writes it ("star-rating Three")
+RATING_MAP = {"One": 1, "Two": 2, "Three": 3, "Four": 4, "Five": 5}
+RAW_BOOK_FIELDS = ("title", "price_raw", "rating", "availability", "href_raw", "image_raw")
 
-    for article in articles:
-        title = article.h3.a["title"]
-        price_text = article.find("p", class_="price_color").get_text(strip=True)
-        price_value = float(price_text[1:])
+def new_book_columns() -> BookColumns:
+    return {field: [] for field in RAW_BOOK_FIELDS}
 
-        rating_word = article.find("p", class_="star-rating")["class"][1]
-        rating = rating_map.get(rating_word.lower())
+def extend_book_columns(columns: BookColumns, other: BookColumns) -> None:
+    for field in RAW_BOOK_FIELDS:
+        columns[field].extend(other[field])
 
-        availability = article.find("p", class_="instock availability").get_text(strip=True)
+def append_book(columns: BookColumns, title: str, price_text: str, rating_word: str,
+                availability: str, image_src: str, href: str) -> None:
+    # Only raw strings are kept per article; URL/price munging is vectorized in
+    # normalize_books_frame once all pages are collected
+    columns["title"].append(title)
+    columns["price_raw"].append(price_text)
+    columns["rating"].append(RATING_MAP.get(rating_word))
+    columns["availability"].append(availability)
+    columns["href_raw"].append(href)
+    columns["image_raw"].append(image_src)
 
-        image_url_relative = article.find("img")["src"].replace("../..", "")
-        image_url = BASE_URL + image_url_relative
+LISTING_HREF_PREFIX = r"^(?:\.\./)*(?:catalogue/)?"
+BOOK_COLUMNS = ["id", "title", "price", "rating", "availability", "book_url", "image_url"]
 
-        detail_relative_url = (
-            article.h3.a["href"]
-            .replace("../../../", "")
-            .replace("catalogue/", "")
+def normalize_books_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df["price"] = df["price_raw"].str.slice(1).astype("float64")
+    df["image_url"] = BASE_URL + df["image_raw"].str.replace("../..", "", regex=False)
+    # Listing hrefs are "catalogue/<slug>/index.html" on the home page and
+    # "<slug>/index.html" or "../../../<slug>/index.html" elsewhere; one anchored strip
+    df["book_url"] = CATALOGUE_URL + df["href_raw"].str.replace(LISTING_HREF_PREFIX, "", regex=True)
+    df["id"] = df["book_url"].str.extract(r"_(\d+)/index\.html$", expand=False).astype("Int32")
+    df = df.drop(columns=["price_raw", "image_raw", "href_raw"]).reindex(columns=BOOK_COLUMNS)
+
+    # Smallest dtypes that fit: ratings are 1-5 and availability has a handful of values
+    return df.astype({
+        "rating": "Int8",
+        "title": "string",
+        "availability": "category",
+    })
+
+def parse_books_regex(html: str) -> BookColumns | None:
+    """
+    Returns None when the page does not match the expected template.
+    """
+    books_data = new_book_columns()
+    for pod in PRODUCT_POD_RE.finditer(html):
+        block = pod.group(1)
+        title_link = TITLE_LINK_RE.search(block)
+        price = PRICE_RE.search(block)
+        rating = RATING_RE.search(block)
+        availability = AVAILABILITY_RE.search(block)
+        image = IMAGE_RE.search(block)
+        if not (title_link and price and rating and availability and image):
+            return None
+
+        append_book(
+            books_data,
+            title=unescape(title_link.group(2)),
+            price_text=unescape(price.group(1)).strip(),
+            rating_word=rating.group(1),
+            availability=TAG_RE.sub("", availability.group(1)).strip(),
+            image_src=unescape(image.group(1)),
+            href=unescape(title_link.group(1)),
         )
-        book_url = BASE_URL + "catalogue/" + detail_relative_url
-        book_id = extract_book_id(book_url)
-
-        books_data.append(
-            {
-                "id": book_id,
-                "title": title,
-                "price": price_value,
-                "rating": rating,
-                "availability": availability,
-                "book_url": book_url,
-                "image_url": image_url,
-            }
+
+    return books_data if books_data["title"] else None
+
+def parse_books_lxml(html: str) -> BookColumns:
+    tree = lxml.html.fromstring(html)
+
+    books_data = new_book_columns()
+    for article in XP_ARTICLES(tree):
+        append_book(
+            books_data,
+            title=XP_TITLE(article),
+            price_text=XP_PRICE(article),
+            rating_word=XP_RATING(article).split()[1],
+            availability=XP_AVAILABILITY(article),
+            image_src=XP_IMAGE(article),
+            href=XP_HREF(article),
         )
 
     return books_data
 
-async def main(urls: list[str]) -> list[dict]:
-    async with aiohttp.ClientSession() as session:
-        tasks = [asyncio.create_task(scrape_book_page_async(session, url)) for url in urls]
-        all_pages_data = await asyncio.gather(*tasks)
+def parse_listing_page(html: str, url: str) -> BookColumns:
+    books_data = parse_books_regex(html)
+    if books_data is None:
+        logger.info(f"Unexpected markup on {url}, parsing with lxml")
+        books_data = parse_books_lxml(html)
+    return books_data
+
+async def scrape_book_page_async(session, sem, url: str) -> BookColumns:
+    books_data = await fetch_parsed(session, sem, url, lambda html: parse_listing_page(html, url))
+    return new_book_columns() if books_data is None else books_data
 
-    all_books_data = []
-    for page_data in all_pages_data:
-        all_books_data.extend(page_data)
+async def main(session, sem, urls: list[str], first_page_data: BookColumns) -> BookColumns:
+    tasks = [asyncio.create_task(scrape_book_page_async(session, sem, url)) for url in urls]
+    all_pages_data = await asyncio.gather(*tasks)
+
+    # Page results may be shared with _VALIDATOR_CACHE, so copy into fresh columns
+    all_books_data = new_book_columns()
+    for page_data in (first_page_data, *all_pages_data):
+        extend_book_columns(all_books_data, page_data)
     return all_books_data
 
-def get_total_pages() -> int:
-    response = requests.get(BASE_URL, timeout=30)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "html.parser")
-    current_page = soup.select_one("ul.pager li.current")
-    if not current_page:
-        return 1
-    text = current_page.get_text(strip=True)
-    return int(text.split("of")[-1])
+CategoryLink = tuple[str, str]  # (category name, href relative to BASE_URL)
+
+def parse_home_page(html: str) -> tuple[int, BookColumns, list[CategoryLink]]:
+    tree = lxml.html.fromstring(html)
+    links = [(link.text_content().strip(), link.get("href")) for link in XP_SIDEBAR_CATEGORIES(tree)]
+    return get_page_count(tree), parse_listing_page(html, BASE_URL), links
+
+async def bootstrap(session, sem) -> tuple[int, BookColumns, list[CategoryLink]]:
+    """
+    Fetches the home page once and returns (total pages, page 1 books, sidebar
+    category links); the links are reused later to map books to categories.
+    """
+    home = await fetch_parsed(session, sem, BASE_URL, parse_home_page)
+    if home is None:
+        raise RuntimeError(f"Could not fetch {BASE_URL}")
+    return home
+
+def create_pages_urls(total: int) -> list[str]:
+    # Page 1 is the home page, already scraped by bootstrap()
+    return [BASE_URL + f"catalogue/page-{n}.html" for n in range(2, total + 1)]
+
+def parse_category_page(html: str) -> tuple[int, list[int]]:
+    # One XPath pass per page collects every article link
+    tree = lxml.html.fromstring(html)
+    book_ids = []
+    for href in XP_ARTICLE_HREFS(tree):
+        book_id = extract_book_id(href)
+        if book_id is not None:
+            book_ids.append(book_id)
+    return get_page_count(tree), book_ids
 
-def create_pages_urls() -> list[str]:
-    total = get_total_pages()
-    return [BASE_URL, *[BASE_URL + f"catalogue/page-{n}.html" for n in range(2, total + 1)]]
+async def scrape_category_book_ids_async(session, sem, index_url: str) -> list[int]:
+    first_page = await fetch_parsed(session, sem, index_url, parse_category_page)
+    if first_page is None:
+        return []
+
+    total, first_ids = first_page
+    # New list: the per-page id lists may be shared with _VALIDATOR_CACHE
+    book_ids = list(first_ids)
+    if total > 1:
+        base_url = index_url.rsplit("/", 1)[0] + "/"
+        pages = await asyncio.gather(
+            *[fetch_parsed(session, sem, base_url + f"page-{n}.html", parse_category_page)
+              for n in range(2, total + 1)]
+        )
+        for page in pages:
+            if page is not None:
+                book_ids.extend(page[1])
+    return book_ids
+
+async def scrape_categories_async(session, sem, category_links: list[CategoryLink]) -> dict[int, str]:
+    """
+    Maps book id -> category by walking the sidebar category listings
+    (~50 categories, a few pages each) instead of every book's detail page.
+    """
+    results = await asyncio.gather(
+        *[scrape_category_book_ids_async(session, sem, BASE_URL + href) for _, href in category_links]
+    )
+
+    book_to_category: dict[int, str] = {}
+    for (category, _), book_ids in zip(category_links, results):
+        for book_id in book_ids:
+            book_to_category[book_id] = category
+    return book_to_category
 
-async def fill_categories_async(df: pd.DataFrame) -> pd.DataFrame:
-    async with aiohttp.ClientSession() as session:
-        tasks = [scrape_category_from_book_page_async(session, url) for url in df["book_url"]]
-        df["category"] = await asyncio.gather(*tasks)
+async def fill_categories_async(session, sem, df: pd.DataFrame,
+                                category_links: list[CategoryLink]) -> pd.DataFrame:
+    # pop() removes the column in place (no DataFrame copy) and keeps the URLs
+    # around for the detail-page fallback
+    book_urls = df.pop("book_url")
+    book_to_category = await scrape_categories_async(session, sem, category_links)
+    # object dtype: an empty map would otherwise give an all-NaN float64 column that
+    # the fallback below cannot fill with strings
+    df["category"] = df["id"].map(book_to_category).astype(object)
 
-    return df.drop(columns=["book_url"])
+    # Books missing from every category listing fall back to their detail page
+    missing = df["category"].isna()
+    if missing.any():
+        logger.info(f"Fetching category from detail pages for {int(missing.sum())} books")
+        urls = book_urls[missing].tolist()
+        categories: list[str | None] = [None] * len(urls)
+
+        queue: asyncio.Queue[tuple[int, str]] = asyncio.Queue()
+        for item in enumerate(urls):
+            queue.put_nowait(item)
+
+        # Fixed pool of workers (matching the per-host connection limit) instead of
+        # one task per URL; each writes its result into the URL's slot
+        async def worker() -> None:
+            while True:
+                i, url = await queue.get()
+                try:
+                    categories[i] = await scrape_category_from_book_page_async(session, sem, url)
+                except Exception as e:
+                    # Keep the worker alive so queue.join() cannot stall on leftovers
+                    logger.error(f"Error scraping category for {url}: {e}")
+                    categories[i] = "N/A"
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(MAX_CONCURRENCY, len(urls)))]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        df.loc[missing, "category"] = categories
+
+    return df
 
 async def scrape_to_dataframe() -> pd.DataFrame:
-    all_books = await main(create_pages_urls())
-    df = pd.DataFrame(all_books)
-    df = await fill_categories_async(df)
+    # Semaphore is created per run: asyncio.run() starts a new loop each time
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    # Every phase shares this session, so connections and DNS stay warm throughout
+    async with aiohttp.ClientSession(connector=make_connector(), headers=REQUEST_HEADERS) as session:
+        total, first_page_books, category_links = await bootstrap(session, sem)
+        all_books = await main(session, sem, create_pages_urls(total), first_page_books)
+        df = normalize_books_frame(pd.DataFrame(all_books))
+        df = await fill_categories_async(session, sem, df, category_links)
     return df
 
+def write_books_csv(df: pd.DataFrame, output_path: str) -> None:
+    # Missing values (pd.NA / NaN / None) become empty cells, as DataFrame.to_csv wrote them
+    cells = df.astype(object).where(df.notna(), "")
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        # lineterminator: csv defaults to \r\n, DataFrame.to_csv wrote \n
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(df.columns)
+        writer.writerows(cells.itertuples(index=False, name=None))
+
 def scrape_and_save_csv(output_path: str = "./data/all_books.csv") -> str:
     """
     Synchronous wrapper (safe to call from background threads).
     """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    df = asyncio.run(scrape_to_dataframe())
-    df.to_csv(output_path, index=False, header=True)
+    # uvloop.run, like asyncio.run, creates a fresh loop, so this stays safe in threads
+    run = uvloop.run if uvloop is not None else asyncio.run
+    df = run(scrape_to_dataframe())
+    write_books_csv(df, output_path)
     logger.info(f"Data saved to {output_path}. Total books: {len(df)}")
     return output_path
 